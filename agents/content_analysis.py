@@ -1,29 +1,7 @@
-import re
 from .base_agent import BaseAgent
+from .rule_packs import get_rules
 
 class ContentAnalysisAgent(BaseAgent):
-    def __init__(self, pref_manager):
-        super().__init__(pref_manager)
-        self.restriction_patterns = {
-            'scraping': [
-                'scraping is (strictly )?prohibited',
-                'web scraping is (explicitly )?forbidden',
-                'automated data collection is (strictly )?prohibited',
-                'data scraping is (expressly )?forbidden',
-                'no automated access',
-                'no scraping allowed',
-                'prohibits web crawling',
-                'automated access prohibited'
-            ],
-            'copyright': [
-                'all rights reserved',
-                'no reproduction without permission',
-                'prohibited without explicit permission',
-                'unauthorized access prohibited',
-                'content is protected by copyright'
-            ]
-        }
-
     def analyze_content(self, content, content_type):
         """Analyze content for restrictions"""
         if not content or not content.get('success', False):
@@ -37,13 +15,8 @@ class ContentAnalysisAgent(BaseAgent):
             }
 
         text = content.get('content', '').lower()
-        found_restrictions = []
-        patterns = self.restriction_patterns.get(content_type, [])
-
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                found_restrictions.append(pattern)
+        # Restriction patterns come from the rule packs, keyed by content type
+        found_restrictions = [rule.pattern for rule in get_rules().find(text, content_type)]
 
         # Apply learned preferences
         context = f"{content_type}_{len(found_restrictions)}"
@@ -1,4 +1,5 @@
 from .base_agent import BaseAgent
+from .rule_packs import get_rules
 from typing import Dict, List, Any
 import uuid
 
@@ -16,6 +17,10 @@ class DecisionMakingAgent(BaseAgent):
         self.high_confidence = 90.0
         self.medium_confidence = 75.0
 
+        # Confidence lost per input that was missing when the decision was made
+        self.missing_input_penalty = 0.2
+        self.min_degraded_factor = 0.2
+
         # Risk levels for different restriction types
         self.restriction_severity = {
             'explicit_prohibition': 1.0,    # Direct "no scraping" statements
@@ -60,28 +65,19 @@ class DecisionMakingAgent(BaseAgent):
         severity = 0.0
         details_lower = str(details).lower()
 
-        # Check for explicit prohibitions
-        if any(phrase in details_lower for phrase in [
-            'prohibited', 'forbidden', 'not allowed', 'not permitted'
-        ]):
-            severity = max(severity, self.restriction_severity['explicit_prohibition'])
-
-        # Check for rate limiting
-        if any(phrase in details_lower for phrase in [
-            'rate limit', 'throttling', 'requests per'
-        ]):
-            severity = max(severity, self.restriction_severity['rate_limiting'])
-
-        # Check for authentication requirements
-        if any(phrase in details_lower for phrase in [
-            'login required', 'authentication required', 'authorized access'
-        ]):
-            severity = max(severity, self.restriction_severity['authentication'])
+        # Severity phrases come from the rule packs; each names its severity level
+        for phrase_rule in get_rules().find(details_lower, 'severity'):
+            level = self.restriction_severity.get(phrase_rule.severity)
+            if level is not None:
+                severity = max(severity, level * phrase_rule.weight)
 
         return severity if severity > 0 else self.restriction_severity['no_specification']
 
     def make_decision(self, rules: List[Dict[str, Any]], url: str) -> Dict[str, Any]:
         """Make final decision based on all analyses"""
+        if not rules:
+            return self.no_evidence_decision(url)
+
         total_weighted_score = 0.0
         total_weight = 0.0
         restriction_details = []
@@ -117,6 +113,18 @@ class DecisionMakingAgent(BaseAgent):
         context = f"decision_{is_restricted}"
         confidence_modifier = self.get_preference(context)
 
+        return self._build_decision(
+            url,
+            is_restricted,
+            highest_confidence * confidence_modifier,
+            restriction_score * 100,
+            restriction_details,
+            "Detailed analysis of scraping permissions based on multiple factors"
+        )
+
+    def _build_decision(self, url: str, is_restricted: bool, confidence: float,
+                        restriction_score: float, restriction_details: List[Dict[str, Any]],
+                        summary: str) -> Dict[str, Any]:
         return {
             "rightsToDerivate": not is_restricted,
             "rightsToRedistribute": not is_restricted,
@@ -126,10 +134,10 @@ class DecisionMakingAgent(BaseAgent):
             "schemaVersion": "1",
             "usageLicenseType": "RESTRICTED" if is_restricted else "OPEN",
             "details": {
-                "decision_confidence": highest_confidence * confidence_modifier,
-                "restriction_score": restriction_score * 100,
+                "decision_confidence": confidence,
+                "restriction_score": restriction_score,
                 "restrictions_found": restriction_details,
-                "analysis_summary": "Detailed analysis of scraping permissions based on multiple factors",
+                "analysis_summary": summary,
             },
             "elementId": str(uuid.uuid4()),
             "@id": url,
@@ -137,6 +145,53 @@ class DecisionMakingAgent(BaseAgent):
             "licenseRightsReference": url
         }
 
+    def fallback_decision(self, rules: List[Dict[str, Any]], url: str) -> Dict[str, Any]:
+        """Conservative decision used when make_decision could not finish in time.
+
+        Any rule reporting a restriction makes the result RESTRICTED, at half
+        the best available confidence.
+        """
+        if not rules:
+            return self.no_evidence_decision(url)
+
+        restricted = [rule for rule in rules if rule.get('status', '').lower() == 'restricted']
+        confidence = max((float(rule.get('confidence', 85.0)) for rule in rules), default=1.0)
+        return self._build_decision(
+            url,
+            bool(restricted),
+            confidence * 0.5,
+            100.0 if restricted else 0.0,
+            [{
+                'source': rule.get('details', 'Unknown source'),
+                'severity': self.restriction_severity['no_specification'],
+                'confidence': float(rule.get('confidence', 85.0)),
+                'details': rule.get('details', '')
+            } for rule in restricted],
+            "Fallback decision: weighted analysis did not complete in time"
+        )
+
+    def no_evidence_decision(self, url: str) -> Dict[str, Any]:
+        """Decision when nothing could be analyzed: no rights are granted without evidence"""
+        return self._build_decision(
+            url,
+            True,
+            0.0,
+            0.0,
+            [],
+            "No inputs could be analyzed; scraping is not permitted until the site can be checked"
+        )
+
+    def apply_degradation(self, decision: Dict[str, Any],
+                          missing_inputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Mark a decision as degraded and lower its confidence for each missing input"""
+        details = decision['details']
+        details['degraded'] = bool(missing_inputs)
+        details['missing_inputs'] = missing_inputs
+        if missing_inputs:
+            factor = max(self.min_degraded_factor, 1.0 - self.missing_input_penalty * len(missing_inputs))
+            details['decision_confidence'] *= factor
+        return decision
+
     def explain_decision(self, decision: Dict[str, Any]) -> str:
         """Provide human-readable explanation of the decision"""
         is_restricted = decision['usageLicenseType'] == 'RESTRICTED'
@@ -157,4 +212,9 @@ class DecisionMakingAgent(BaseAgent):
         else:
             explanation.append("\nNo explicit restrictions found.")
 
+        if decision['details'].get('degraded'):
+            explanation.append("\nDegraded result, some inputs were missing:")
+            for missing in decision['details'].get('missing_inputs', []):
+                explanation.append(f"- {missing['input']} ({missing['stage']}): {missing['reason']}")
+
         return "\n".join(explanation)
\ No newline at end of file
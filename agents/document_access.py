@@ -1,60 +1,131 @@
-import requests
+import time
 from urllib.parse import urljoin
 from .base_agent import BaseAgent
 
 class DocumentAccessAgent(BaseAgent):
-    def __init__(self, pref_manager):
+    def __init__(self, pref_manager, max_document_bytes=2_000_000):
         super().__init__(pref_manager)
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.request_timeout = 10
+        self.max_document_bytes = max_document_bytes
+        self.chunk_size = 64 * 1024
+        self._session = None
 
-    def fetch_document(self, url, doc_type):
-        """Fetch different types of documents (robots.txt, ToS, etc.)"""
+    @property
+    def session(self):
+        """HTTP session, created on first fetch so importing the agent stays cheap"""
+        if self._session is None:
+            import requests
+
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            })
+            self._session = session
+        return self._session
+
+    def _timeout(self, deadline):
+        """Per-request timeout, capped by the time left before `deadline` (a time.monotonic() value)"""
+        if deadline is None:
+            return self.request_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('Fetch deadline exceeded')
+        return min(self.request_timeout, remaining)
+
+    def _get(self, url, deadline):
+        """GET `url` and return (status_code, text, headers).
+
+        requests' timeout only bounds each socket read, so the body is
+        streamed and the deadline checked between reads; it is also cut off
+        at max_document_bytes. A host trickling bytes can therefore hold the
+        thread for at most one socket timeout past the deadline.
+        """
+        response = self.session.get(url, timeout=self._timeout(deadline), stream=True)
+        try:
+            if response.status_code != 200:
+                return response.status_code, '', dict(response.headers)
+
+            # iter_content blocks until a whole chunk has arrived; read1
+            # returns whatever is available, so the deadline is checked often
+            if hasattr(response.raw, 'read1'):
+                chunks = iter(lambda: response.raw.read1(self.chunk_size, decode_content=True), b'')
+            else:
+                chunks = response.iter_content(self.chunk_size)
+
+            body = bytearray()
+            for chunk in chunks:
+                body += chunk
+                if len(body) >= self.max_document_bytes:
+                    del body[self.max_document_bytes:]
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError('Fetch deadline exceeded')
+            text = body.decode(response.encoding or 'utf-8', errors='replace')
+            return response.status_code, text, dict(response.headers)
+        finally:
+            response.close()
+
+    def fetch_document(self, url, doc_type, deadline=None):
+        """Fetch different types of documents (robots.txt, ToS, etc.)
+
+        Results carry 'unavailable': True when the document could not be
+        retrieved at all (network error or deadline), as opposed to the
+        site simply not having it.
+        """
         try:
             if doc_type == 'robots.txt':
                 parsed_url = urljoin(url, '/robots.txt')
-                response = self.session.get(parsed_url, timeout=10)
+                status_code, text, headers = self._get(parsed_url, deadline)
                 return {
-                    'success': response.status_code == 200,
-                    'content': response.text if response.status_code == 200 else '',
+                    'success': status_code == 200,
+                    'content': text,
                     'url': parsed_url,
-                    'headers': dict(response.headers)
+                    'status_code': status_code,
+                    'headers': headers
                 }
             elif doc_type == 'tos':
                 tos_paths = ['/terms', '/terms-of-service', '/tos', '/terms-and-conditions']
+                errors = 0
                 for path in tos_paths:
                     try:
                         full_url = urljoin(url, path)
-                        response = self.session.get(full_url, timeout=10)
-                        if response.status_code == 200:
+                        status_code, text, headers = self._get(full_url, deadline)
+                        if status_code == 200:
                             return {
                                 'success': True,
-                                'content': response.text,
+                                'content': text,
                                 'url': full_url,
-                                'headers': dict(response.headers)
+                                'status_code': status_code,
+                                'headers': headers
                             }
+                    except TimeoutError:
+                        raise
                     except:
+                        errors += 1
                         continue
+                # Only unavailable if every candidate path failed to respond
+                unavailable = errors == len(tos_paths)
                 return {
                     'success': False,
-                    'error': 'No ToS found',
+                    'error': 'No ToS path responded' if unavailable else 'No ToS found',
                     'url': url,
-                    'headers': {}
+                    'headers': {},
+                    'unavailable': unavailable
                 }
             else:  # main page
-                response = self.session.get(url, timeout=10)
+                status_code, text, headers = self._get(url, deadline)
                 return {
-                    'success': response.status_code == 200,
-                    'content': response.text if response.status_code == 200 else '',
+                    'success': status_code == 200,
+                    'content': text,
                     'url': url,
-                    'headers': dict(response.headers)
+                    'status_code': status_code,
+                    'headers': headers
                 }
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
                 'url': url,
-                'headers': {}
-            }
\ No newline at end of file
+                'headers': {},
+                'unavailable': True
+            }
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urljoin
+
+from .base_agent import BaseAgent
+
+
+class RequestBudget:
+    """Token bucket limiting how many outbound requests the scheduler makes per minute.
+
+    Only the scheduler's own requests in this process draw from it; it does
+    not meter interactive traffic. See InteractiveTraffic for how the
+    scheduler yields to that.
+    """
+
+    def __init__(self, requests_per_minute):
+        self.capacity = max(1, int(requests_per_minute))
+        self.tokens = float(self.capacity)
+        self.refill_rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def acquire(self, cost=1, stop_event=None):
+        """Block until `cost` tokens are available. Returns False if stopped while waiting."""
+        cost = min(cost, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return True
+                wait = (cost - self.tokens) / self.refill_rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class InteractiveTraffic:
+    """Tracks interactive analyses in this process so background work can yield to them.
+
+    The scheduler waits until no interactive request has been in flight for
+    `quiet_seconds` before each of its own requests. This only sees requests
+    served by the same process; with several server processes, each one's
+    scheduler only yields to its own traffic.
+    """
+
+    def __init__(self, quiet_seconds=5.0):
+        self.quiet_seconds = quiet_seconds
+        self.in_flight = 0
+        self.last_finished = float('-inf')
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def track(self):
+        with self.condition:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= 1
+                self.last_finished = time.monotonic()
+                self.condition.notify_all()
+
+    def wait_until_idle(self, stop_event=None):
+        """Block until interactive traffic has been quiet long enough. Returns False if stopped."""
+        with self.condition:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                if self.in_flight == 0:
+                    quiet_for = time.monotonic() - self.last_finished
+                    if quiet_for >= self.quiet_seconds:
+                        return True
+                    timeout = self.quiet_seconds - quiet_for
+                else:
+                    timeout = self.quiet_seconds
+                # Wake periodically so a stop request is noticed promptly
+                self.condition.wait(min(timeout, 1.0))
+
+
+class RevalidationAgent(BaseAgent):
+    """Background scheduler that re-checks previously analyzed domains.
+
+    Each domain gets a cheap HEAD / conditional GET check first; the full
+    analysis pipeline only runs when the site appears to have changed.
+    Every outbound request first waits for interactive traffic to go quiet
+    (if an InteractiveTraffic tracker is given) and then for the per-minute
+    budget. A full analysis already under way is not paused if interactive
+    requests arrive meanwhile.
+    """
+
+    # Requests issued by one full pipeline run (robots.txt, up to four ToS paths, main page)
+    FULL_ANALYSIS_COST = 6
+
+    # Cadence doubles after each consecutive failed check, up to 2 ** this
+    MAX_FAILURE_BACKOFF = 6
+
+    def __init__(self, pref_manager, database, analyze_fn, interval_hours=24.0,
+                 requests_per_minute=30, full_refresh_days=7.0, poll_seconds=60.0,
+                 interactive=None):
+        import requests
+
+        super().__init__(pref_manager)
+        self.db = database
+        self.analyze_fn = analyze_fn
+        self.interval = timedelta(hours=interval_hours)
+        self.full_refresh = timedelta(days=full_refresh_days)
+        self.poll_seconds = poll_seconds
+        self.budget = RequestBudget(requests_per_minute)
+        self.interactive = interactive
+        self.low_confidence = 75.0
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _acquire(self, cost=1):
+        """Wait for interactive traffic to go quiet, then for budget. Returns False if stopped."""
+        if self.interactive is not None and not self.interactive.wait_until_idle(self._stop):
+            return False
+        return self.budget.acquire(cost, stop_event=self._stop)
+
+    @staticmethod
+    def _parse_timestamp(value):
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+
+    def _cadence(self, result, state, now):
+        """Shorter re-check cadence for restricted, low-confidence or recently changed domains"""
+        cadence = self.interval
+        license_type = result.get('Issuer', {}).get('LicenseType', {})
+
+        if license_type.get('usageLicenseType') == 'RESTRICTED':
+            cadence /= 2
+
+        confidence = float(license_type.get('details', {}).get('decision_confidence', 100.0))
+        if confidence <= 1.0:
+            confidence *= 100
+        if confidence < self.low_confidence:
+            cadence /= 2
+
+        last_changed = self._parse_timestamp(state.get('last_changed')) if state else None
+        if last_changed and now - last_changed < self.interval:
+            cadence /= 2
+
+        return cadence * self.get_preference('revalidation_cadence')
+
+    def get_due_domains(self, now=None):
+        """Return (priority, url, analyzed_at) for due domains, most urgent first"""
+        now = now or datetime.utcnow()
+        due = []
+        for url, result_json, timestamp in self.db.get_latest_analyses():
+            try:
+                result = json.loads(result_json)
+            except (TypeError, ValueError):
+                result = {}
+            state = self.db.get_revalidation_state(url)
+            analyzed_at = self._parse_timestamp(timestamp) or now
+            last_checked = self._parse_timestamp(state.get('last_checked')) if state else None
+            since = max(analyzed_at, last_checked) if last_checked else analyzed_at
+
+            cadence = self._cadence(result, state, now)
+            failures = state.get('failures', 0) if state else 0
+            if failures:
+                # Unreachable domains back off so they don't crowd out healthy ones
+                cadence *= 2 ** min(failures, self.MAX_FAILURE_BACKOFF)
+            priority = (now - since) / cadence if cadence.total_seconds() > 0 else float('inf')
+            if priority >= 1.0:
+                due.append((priority, url, analyzed_at))
+
+        due.sort(key=lambda item: item[0], reverse=True)
+        return due
+
+    def _fetch_validators(self, url, state):
+        """HEAD the page (falling back to a conditional GET) and return its validators"""
+        conditional = {}
+        if state and state.get('etag'):
+            conditional['If-None-Match'] = state['etag']
+        if state and state.get('last_modified'):
+            conditional['If-Modified-Since'] = state['last_modified']
+
+        if not self._acquire():
+            return None
+        response = self.session.head(url, headers=conditional, timeout=10, allow_redirects=True)
+        if response.status_code in (405, 501):
+            if not self._acquire():
+                return None
+            response = self.session.get(url, headers=conditional, timeout=10, stream=True)
+            response.close()
+
+        if response.status_code == 304 and state:
+            return state.get('etag'), state.get('last_modified'), ''
+        return (
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            '' if response.headers.get('ETag') or response.headers.get('Last-Modified')
+            else response.headers.get('Content-Length', '')
+        )
+
+    def check_for_changes(self, url):
+        """Cheaply determine whether a domain changed since it was last seen.
+
+        Returns (changed, observation), or None if the check could not be
+        completed. Nothing is stored here: revalidate saves the observation
+        once it has acted on it, so a change is not forgotten if the
+        follow-up analysis fails.
+        """
+        import requests
+
+        state = self.db.get_revalidation_state(url)
+        try:
+            validators = self._fetch_validators(url, state)
+            if validators is None:
+                return None
+            etag, last_modified, content_length = validators
+
+            if not self._acquire():
+                return None
+            robots = self.session.get(urljoin(url, '/robots.txt'), timeout=10)
+            robots_text = robots.text if robots.status_code == 200 else ''
+        except requests.RequestException as e:
+            print(f"Revalidation check failed for {url}: {e}")
+            self.db.record_revalidation_failure(url)
+            return None
+
+        fingerprint = hashlib.sha256('|'.join([
+            etag or '', last_modified or '', content_length or '', robots_text
+        ]).encode('utf-8')).hexdigest()
+
+        # The first observation only records a baseline for later comparisons
+        previous_hash = state.get('content_hash') if state else None
+        changed = previous_hash is not None and previous_hash != fingerprint
+        return changed, (etag, last_modified, fingerprint)
+
+    def _save_observation(self, url, changed, observation):
+        etag, last_modified, fingerprint = observation
+        self.db.save_revalidation_state(url, etag, last_modified, fingerprint, changed)
+
+    def revalidate(self, url, analyzed_at, now=None):
+        """Re-check one domain, running the full pipeline if needed. Returns the action taken."""
+        now = now or datetime.utcnow()
+        check = self.check_for_changes(url)
+        if check is None:
+            return 'skipped'
+        changed, observation = check
+
+        if not changed and now - analyzed_at < self.full_refresh:
+            self._save_observation(url, changed, observation)
+            return 'unchanged'
+
+        if not self._acquire(self.FULL_ANALYSIS_COST):
+            return 'skipped'
+        try:
+            self.analyze_fn(url)
+        except Exception as e:
+            print(f"Revalidation analysis failed for {url}: {e}")
+            # Back off, but keep the old fingerprint so the change is seen again next time
+            self.db.record_revalidation_failure(url)
+            return 'failed'
+        self._save_observation(url, changed, observation)
+        return 'reanalyzed'
+
+    def run_once(self):
+        """Walk all due domains once and return a summary of actions taken"""
+        summary = {'unchanged': 0, 'reanalyzed': 0, 'skipped': 0, 'failed': 0}
+        for _, url, analyzed_at in self.get_due_domains():
+            if self._stop.is_set():
+                break
+            summary[self.revalidate(url, analyzed_at)] += 1
+        return summary
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                summary = self.run_once()
+                if summary['reanalyzed'] or summary['failed']:
+                    print(f"Revalidation pass complete: {summary}")
+            except Exception as e:
+                print(f"Revalidation pass failed: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        """Start the scheduler in a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='revalidation', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
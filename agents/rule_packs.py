@@ -0,0 +1,366 @@
+"""Pluggable rule packs for restriction, CAPTCHA and severity detection.
+
+A rule pack is a JSON file in the rules directory:
+
+    {
+        "name": "default",
+        "language": "en",
+        "rules": [
+            {"category": "scraping", "pattern": "no scraping allowed"},
+            {"category": "scraping", "pattern": "scraping is (strictly )?prohibited", "kind": "regex"},
+            {"category": "severity", "pattern": "forbidden", "severity": "explicit_prohibition", "weight": 1.0}
+        ]
+    }
+
+`kind` is "phrase" (case-insensitive substring, the default) or "regex".
+`language` and `weight` default to the pack-level values (and 1.0).
+`severity` names a level in DecisionMakingAgent.restriction_severity.
+
+All packs are compiled into one table of literals per category: the
+phrases plus a required literal taken from each regex. A document is
+searched for those literals with C-level substring tests, or, for large
+categories, with a single trie-shaped regex built on first use; only regex
+rules whose literal was seen are then verified. The tables are plain lists
+and tuples kept in a marshal cache file (in the user's cache directory,
+keyed on the packs' mtimes), and the registry reloads packs when the files
+change.
+"""
+import gc
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+
+Rule = namedtuple('Rule', 'category pattern kind language weight severity')
+
+# Bump when the layout of the compiled tables changes to invalidate old caches
+CACHE_FORMAT = 3
+
+# Categories with more literals than this are scanned with one regex instead
+# of a substring test per literal, which costs more to build but less per literal
+SUBSTRING_SCAN_LIMIT = 200
+
+DEFAULT_RULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rules')
+
+_REGEX_META = set('.^$*+?{}[]\\|()')
+_OPTIONAL_GROUP = re.compile(r'\([^()]*\)\?')
+
+
+def default_cache_path(directory):
+    """Per-user cache file for a rules directory, kept outside the (possibly shared) rules dir"""
+    if os.environ.get('RULE_PACK_CACHE'):
+        return os.environ['RULE_PACK_CACHE']
+    cache_root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    key = hashlib.sha256(os.path.abspath(directory).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_root, 'scraping-analyzer', f'rulepacks-{key}.marshal')
+
+
+class RulePackError(ValueError):
+    """Raised when a rule pack file is malformed"""
+
+
+def load_pack_file(path):
+    """Parse one rule pack file into a list of Rules"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            pack = json.load(f)
+    except (OSError, ValueError) as e:
+        raise RulePackError(f"Could not read rule pack {path}: {e}") from e
+
+    if not isinstance(pack, dict) or not isinstance(pack.get('rules'), list):
+        raise RulePackError(f"Rule pack {path} must be an object with a 'rules' list")
+
+    default_language = pack.get('language', 'any')
+    rules = []
+    for i, entry in enumerate(pack['rules']):
+        if not isinstance(entry, dict) or not entry.get('category') or not entry.get('pattern'):
+            raise RulePackError(f"Rule {i} in {path} needs a 'category' and a 'pattern'")
+        kind = entry.get('kind', 'phrase')
+        if kind not in ('phrase', 'regex'):
+            raise RulePackError(f"Rule {i} in {path} has unknown kind '{kind}'")
+        pattern = entry['pattern'] if kind == 'regex' else entry['pattern'].lower()
+        if kind == 'regex':
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise RulePackError(f"Rule {i} in {path} has an invalid regex: {e}") from e
+        rules.append(Rule(
+            category=entry['category'],
+            pattern=pattern,
+            kind=kind,
+            language=entry.get('language', default_language),
+            weight=float(entry.get('weight', 1.0)),
+            severity=entry.get('severity')
+        ))
+    return rules
+
+
+def required_literal(pattern, min_length=3):
+    """Return a literal substring every match of `pattern` must contain, or None.
+
+    Only handles the simple shape used by most rules: literal text with
+    optional `( ... )?` groups. Anything else is verified unconditionally.
+    """
+    segments = _OPTIONAL_GROUP.split(pattern)
+    if any(ch in _REGEX_META for segment in segments for ch in segment):
+        return None
+    literal = max((segment.strip() for segment in segments), key=len, default='')
+    return literal.lower() if len(literal) >= min_length else None
+
+
+def _trie_pattern(literals):
+    """Return a regex matching any of `literals`, with shared prefixes factored out.
+
+    A flat alternation makes the regex engine try every literal at every
+    position; nesting them by prefix means only one branch is followed per
+    character. Where a literal is a prefix of another, the longer one wins.
+    """
+    root = {}
+    for literal in literals:
+        node = root
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if '' in node else '')
+
+    return build(root)
+
+
+def _build_category(rules, indices):
+    literals = {}
+    unanchored = []
+    for idx in indices:
+        rule = rules[idx]
+        literal = rule.pattern if rule.kind == 'phrase' else required_literal(rule.pattern)
+        if literal is None:
+            unanchored.append(idx)
+        else:
+            literals.setdefault(literal, []).append(idx)
+
+    table = {
+        'literals': list(literals),
+        'literal_rules': [tuple(idxs) for idxs in literals.values()],
+        'unanchored': tuple(unanchored)
+    }
+    if len(literals) > SUBSTRING_SCAN_LIMIT:
+        # The lookahead reports a match at every position, so overlapping
+        # literals are all seen. A literal that is a prefix of a longer one at
+        # the same position is hidden by it, so a match of a literal also
+        # counts for every literal that is a prefix of it
+        ids = {literal: i for i, literal in enumerate(literals)}
+        table['scan_pattern'] = f'(?=({_trie_pattern(literals)}))'
+        table['prefixes'] = [
+            tuple(ids[literal[:n]] for n in range(1, len(literal) + 1) if literal[:n] in ids)
+            for literal in literals
+        ]
+    return table
+
+
+def build_tables(rules):
+    """Compile rules into per-category literal tables made only of lists, dicts and tuples"""
+    by_category = {}
+    for idx, rule in enumerate(rules):
+        by_category.setdefault(rule.category, []).append(idx)
+    return {
+        category: _build_category(rules, indices)
+        for category, indices in by_category.items()
+    }
+
+
+class CompiledRules:
+    """Matcher over all loaded rule packs.
+
+    The tables are ready to scan as soon as they are loaded; scanning
+    regexes for large categories and the regex rules themselves are only
+    compiled the first time they are needed.
+    """
+
+    def __init__(self, rules, tables):
+        self.rules = rules
+        self.tables = tables
+        self._regexes = {}
+        self._scanners = {}
+
+    def _regex(self, idx):
+        regex = self._regexes.get(idx)
+        if regex is None:
+            regex = self._regexes[idx] = re.compile(self.rules[idx].pattern)
+        return regex
+
+    def _scanner(self, category, table):
+        scanner = self._scanners.get(category)
+        if scanner is None:
+            ids = {literal: i for i, literal in enumerate(table['literals'])}
+            scanner = self._scanners[category] = (re.compile(table['scan_pattern']), ids)
+        return scanner
+
+    def _find_literals(self, text, category, table):
+        """Return the ids of the category's literals that occur in `text`"""
+        if 'scan_pattern' not in table:
+            return [i for i, literal in enumerate(table['literals']) if literal in text]
+        regex, ids = self._scanner(category, table)
+        prefixes = table['prefixes']
+        seen = set()
+        for match in set(regex.findall(text)):
+            seen.update(prefixes[ids[match]])
+        return seen
+
+    def find(self, text, category):
+        """Return the rules of `category` that match lowercased `text`, in pack order"""
+        table = self.tables.get(category)
+        if not table or not text:
+            return []
+
+        candidates = set(table['unanchored'])
+        literal_rules = table['literal_rules']
+        for literal_id in self._find_literals(text, category, table):
+            candidates.update(literal_rules[literal_id])
+
+        found = []
+        for idx in sorted(candidates):
+            rule = self.rules[idx]
+            if rule.kind == 'phrase' or self._regex(idx).search(text):
+                found.append(rule)
+        return found
+
+
+class RuleRegistry:
+    """Loads rule packs from a directory, with a binary cache and hot reload"""
+
+    def __init__(self, directory, languages=None, cache_path=None, check_interval=2.0):
+        self.directory = directory
+        self.languages = frozenset(languages) if languages else None
+        self.cache_path = cache_path or default_cache_path(directory)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._signature = None
+        self._last_check = 0.0
+
+    def _pack_files(self):
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith('.json')
+        )
+
+    def _current_signature(self):
+        files = []
+        for path in self._pack_files():
+            stat = os.stat(path)
+            files.append((os.path.basename(path), stat.st_mtime_ns, stat.st_size))
+        languages = tuple(sorted(self.languages)) if self.languages else None
+        return (CACHE_FORMAT, sys.version_info[:2], os.path.abspath(self.directory),
+                languages, tuple(files))
+
+    def _read_cache(self, signature):
+        # Unlike pickle, marshal.load never executes code. It is still not
+        # hardened against hostile files, hence the per-user cache location
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Large packs are many small containers; collector passes while
+        # building them would otherwise dominate the load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            cached = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if not isinstance(cached, dict) or cached.get('signature') != signature:
+            return None
+        return [Rule(*rule) for rule in cached['rules']], cached['tables']
+
+    def _write_cache(self, signature, rules, tables):
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), mode=0o700, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                marshal.dump({
+                    'signature': signature,
+                    'rules': [tuple(rule) for rule in rules],
+                    'tables': tables
+                }, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Could not write rule pack cache: {e}")
+
+    def _load(self, signature):
+        cached = self._read_cache(signature)
+        if cached is not None:
+            return CompiledRules(*cached)
+
+        rules = []
+        for path in self._pack_files():
+            rules.extend(load_pack_file(path))
+        if self.languages:
+            rules = [r for r in rules if r.language in self.languages or r.language == 'any']
+        tables = build_tables(rules)
+        self._write_cache(signature, rules, tables)
+        return CompiledRules(rules, tables)
+
+    def reload(self):
+        """Force a reload from disk (or the cache, if it is still current)"""
+        with self._lock:
+            signature = self._current_signature()
+            self._compiled = self._load(signature)
+            self._signature = signature
+            self._last_check = time.monotonic()
+            return self._compiled
+
+    def get(self):
+        """Return the current CompiledRules, reloading if the pack files changed"""
+        compiled = self._compiled
+        if compiled is None:
+            return self.reload()
+
+        if time.monotonic() - self._last_check < self.check_interval:
+            return compiled
+
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                signature = self._current_signature()
+                if signature != self._signature:
+                    self._compiled = self._load(signature)
+                    self._signature = signature
+                    print("Rule packs reloaded")
+            except (OSError, RulePackError) as e:
+                # Keep serving the last good rules if an edited pack is broken
+                print(f"Warning: Could not reload rule packs: {e}")
+            return self._compiled
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_rules():
+    """Return the process-wide compiled rules, loading the packs on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                languages = os.environ.get('RULE_PACK_LANGUAGES')
+                _registry = RuleRegistry(
+                    os.environ.get('RULE_PACKS_DIR', DEFAULT_RULES_DIR),
+                    languages=[lang.strip() for lang in languages.split(',')] if languages else None
+                )
+    return _registry.get()
@@ -1,22 +1,14 @@
 from .base_agent import BaseAgent
-import re
-from bs4 import BeautifulSoup
+from .rule_packs import get_rules
 
-class TechnicalValidationAgent(BaseAgent):
-    def __init__(self, pref_manager):
-        super().__init__(pref_manager)
-        self.captcha_patterns = [
-            'captcha',
-            'recaptcha',
-            'g-recaptcha',
-            'h-captcha',
-            'cloudflare-challenge',
-            'verify you are human',
-            'human verification',
-            'bot protection',
-            'prove you are human'
-        ]
+RATE_LIMIT_HEADERS = (
+    'X-RateLimit-Limit',
+    'X-RateLimit-Remaining',
+    'X-RateLimit-Reset',
+    'Retry-After'
+)
 
+class TechnicalValidationAgent(BaseAgent):
     def check_technical_restrictions(self, main_content):
         """Analyze technical restrictions like CAPTCHA and metadata"""
         if not main_content or not main_content.get('success', False):
@@ -33,6 +25,9 @@ class TechnicalValidationAgent(BaseAgent):
         headers = main_content.get('headers', {})
 
         try:
+            # Deferred so that importing the agent does not pull in BeautifulSoup
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(html_content, 'html.parser')
 
             # Check meta robots
@@ -49,23 +44,17 @@ class TechnicalValidationAgent(BaseAgent):
                 restrictions.append(f'X-Robots-Tag header: {robots_header}')
                 confidence = 0.95
 
-            # Check for CAPTCHA
+            # Check for CAPTCHA (first matching rule in pack order)
             page_text = html_content.lower()
-            for pattern in self.captcha_patterns:
-                if pattern in page_text:
-                    restrictions.append(f'CAPTCHA detected: {pattern}')
-                    confidence = 0.98
-                    break
+            captcha_rules = get_rules().find(page_text, 'captcha')
+            if captcha_rules:
+                restrictions.append(f'CAPTCHA detected: {captcha_rules[0].pattern}')
+                confidence = 0.98
 
             # Check for rate limiting headers
-            rate_limit_headers = [
-                'X-RateLimit-Limit',
-                'X-RateLimit-Remaining',
-                'X-RateLimit-Reset',
-                'Retry-After'
-            ]
-            for header in rate_limit_headers:
-                if header.lower() in {k.lower(): v for k, v in headers.items()}:
+            header_names = {k.lower() for k in headers}
+            for header in RATE_LIMIT_HEADERS:
+                if header.lower() in header_names:
                     restrictions.append(f'Rate limiting detected: {header}')
                     confidence = 0.90
 
@@ -0,0 +1,74 @@
+"""Startup benchmark for short-lived workers.
+
+Measures, in fresh interpreter processes, for both entry points
+(`pipeline`, used by worker.py, and `main`, the Flask app):
+  - the wall time of the import
+  - which heavy modules that import pulled in
+  - the extra time taken by the first get_components() call
+
+Usage: python benchmarks/startup_benchmark.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['bs4', 'requests', 'flask']
+
+ENTRY_POINTS = ['pipeline', 'main']
+
+PROBE = '''
+import importlib, json, sys, time, contextlib, io
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    module = importlib.import_module(ENTRY_POINT)
+imported = time.perf_counter()
+heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+with contextlib.redirect_stdout(io.StringIO()):
+    module.get_components()
+initialized = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_use_ms": (initialized - imported) * 1000,
+    "heavy_after_import": heavy,
+}))
+'''
+
+
+def run_probe(entry_point):
+    probe = f'HEAVY_MODULES = {HEAVY_MODULES!r}\nENTRY_POINT = {entry_point!r}\n' + PROBE
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE='1')
+    # Run in a scratch directory so the benchmark never touches the real database
+    with tempfile.TemporaryDirectory() as scratch:
+        output = subprocess.run(
+            [sys.executable, '-c', probe],
+            cwd=scratch, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"runs: {args.runs}")
+    for entry_point in ENTRY_POINTS:
+        results = [run_probe(entry_point) for _ in range(args.runs)]
+        import_ms = [r['import_ms'] for r in results]
+        first_use_ms = [r['first_use_ms'] for r in results]
+
+        print(f"\nimport {entry_point}")
+        print(f"  import (median):    {statistics.median(import_ms):.1f} ms")
+        print(f"  import (max):       {max(import_ms):.1f} ms")
+        print(f"  first use (median): {statistics.median(first_use_ms):.1f} ms")
+        print(f"  heavy modules loaded by import: {results[0]['heavy_after_import'] or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
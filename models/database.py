@@ -2,10 +2,26 @@ import sqlite3
 import json
 from datetime import datetime
 
+# Bump whenever create_tables() changes so existing database files are migrated
+SCHEMA_VERSION = 3
+
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('scraping_analyzer.db', check_same_thread=False)
-        self.create_tables()
+    def __init__(self, path='scraping_analyzer.db'):
+        self.path = path
+        # Generous busy timeout: distributed workers may write to the same file concurrently
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.ensure_schema()
+
+    def ensure_schema(self):
+        """Create tables only if this database file has not been initialized yet.
+
+        The schema version is stored in the file itself (PRAGMA user_version), so
+        the check costs a single pragma read per process instead of a round of
+        CREATE TABLE statements.
+        """
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self.create_tables()
 
     def create_tables(self):
         cursor = self.conn.cursor()
@@ -31,6 +47,24 @@ class Database:
             )
         ''')
 
+        # Create revalidation_state table (cheap change-detection validators per URL)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revalidation_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                last_checked TIMESTAMP,
+                last_changed TIMESTAMP,
+                failures INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        # Files created before schema version 3 lack the failures column
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(revalidation_state)')]
+        if 'failures' not in columns:
+            cursor.execute('ALTER TABLE revalidation_state ADD COLUMN failures INTEGER NOT NULL DEFAULT 0')
+
         # Create expert_feedback table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS expert_feedback (
@@ -41,6 +75,7 @@ class Database:
             )
         ''')
 
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
         self.conn.commit()
 
     def save_preference(self, agent_type, context, value):
@@ -89,5 +124,66 @@ class Database:
         ''', (limit,))
         return cursor.fetchall()
 
+    def get_latest_analyses(self):
+        """Return the most recent analysis row for every URL in the history"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT h.url, h.result, h.timestamp
+            FROM analysis_history h
+            JOIN (
+                SELECT url, MAX(id) AS max_id
+                FROM analysis_history
+                GROUP BY url
+            ) latest ON h.id = latest.max_id
+        ''')
+        return cursor.fetchall()
+
+    def get_revalidation_state(self, url):
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT etag, last_modified, content_hash, last_checked, last_changed, failures
+            FROM revalidation_state
+            WHERE url = ?
+        ''', (url,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'last_checked': row[3],
+            'last_changed': row[4],
+            'failures': row[5]
+        }
+
+    def save_revalidation_state(self, url, etag, last_modified, content_hash, changed):
+        now = datetime.utcnow().isoformat()
+        previous = self.get_revalidation_state(url)
+        if changed:
+            last_changed = now
+        else:
+            last_changed = previous['last_changed'] if previous else None
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO revalidation_state
+                (url, etag, last_modified, content_hash, last_checked, last_changed, failures)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        ''', (url, etag, last_modified, content_hash, now, last_changed))
+        self.conn.commit()
+
+    def record_revalidation_failure(self, url):
+        """Record a failed check: advance last_checked and bump the failure count"""
+        now = datetime.utcnow().isoformat()
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT INTO revalidation_state (url, last_checked, failures)
+            VALUES (?, ?, 1)
+            ON CONFLICT(url) DO UPDATE SET
+                last_checked = excluded.last_checked,
+                failures = failures + 1
+        ''', (url, now))
+        self.conn.commit()
+
     def close(self):
         self.conn.close()
\ No newline at end of file
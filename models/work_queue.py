@@ -0,0 +1,221 @@
+import sqlite3
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+WorkItem = namedtuple('WorkItem', 'id url host attempts')
+
+
+class WorkQueue:
+    """Interface for the shared queue that distributed workers pull URLs from.
+
+    Items are leased rather than popped: a leased item returns to the queue
+    if its worker does not complete or fail it before the lease expires.
+    Leasing also enforces per-host politeness shared by all nodes: at most
+    one item per host is leased at a time, and the next one is only handed
+    out once `host_interval` has passed since the previous one finished.
+    """
+
+    def enqueue(self, urls):
+        """Add URLs to the queue, skipping ones already pending or leased. Returns the count added."""
+        raise NotImplementedError
+
+    def lease(self, worker_id, lease_seconds=300, host_interval=10.0):
+        """Lease the next available item whose host is not cooling down, or return None"""
+        raise NotImplementedError
+
+    def complete(self, item, worker_id):
+        raise NotImplementedError
+
+    def fail(self, item, worker_id, error):
+        """Return a failed item to the queue with backoff, or give up after max attempts"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return item counts by status"""
+        raise NotImplementedError
+
+    def has_unfinished(self):
+        stats = self.stats()
+        return stats.get('pending', 0) + stats.get('leased', 0) > 0
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Reference backend: a single SQLite file shared by every worker.
+
+    Lease, politeness and retry bookkeeping each happen in one IMMEDIATE
+    transaction, so workers in separate processes never hand out the same
+    item or hit the same host too soon. The default rollback journal relies
+    only on file locks; for workers on several machines the file must be on
+    a filesystem whose locking SQLite can use. WAL mode is faster but needs
+    every process on the same host (the wal-index is shared memory), so it
+    is opt-in via `wal=True` for single-machine runs only. Times are
+    wall-clock epoch seconds, so nodes need reasonably synchronized clocks.
+    """
+
+    def __init__(self, path='work_queue.db', max_attempts=3, retry_backoff=30.0, wal=False):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self.create_tables()
+
+    def create_tables(self):
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS work_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                host TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_work_items_status
+                ON work_items (status, available_at);
+            CREATE INDEX IF NOT EXISTS idx_work_items_host
+                ON work_items (host, status);
+            CREATE TABLE IF NOT EXISTS host_politeness (
+                host TEXT PRIMARY KEY,
+                next_allowed REAL NOT NULL,
+                interval REAL NOT NULL DEFAULT 0
+            );
+        ''')
+        # Queue files created before the interval column existed
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(host_politeness)')]
+        if 'interval' not in columns:
+            self.conn.execute('ALTER TABLE host_politeness ADD COLUMN interval REAL NOT NULL DEFAULT 0')
+
+    def _transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def enqueue(self, urls):
+        now = time.time()
+        added = 0
+        self._transaction()
+        try:
+            for url in urls:
+                host = urlparse(url).netloc.lower()
+                cursor = self.conn.execute('''
+                    INSERT INTO work_items (url, host, available_at)
+                    SELECT ?, ?, ?
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM work_items
+                        WHERE url = ? AND status IN ('pending', 'leased')
+                    )
+                ''', (url, host, now, url))
+                added += cursor.rowcount
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def _reclaim_expired(self, now):
+        self.conn.execute('''
+            UPDATE work_items
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                last_error = 'lease expired',
+                lease_owner = NULL,
+                lease_expires = NULL
+            WHERE status = 'leased' AND lease_expires < ?
+        ''', (self.max_attempts, now))
+
+    def lease(self, worker_id, lease_seconds=300, host_interval=10.0):
+        now = time.time()
+        self._transaction()
+        try:
+            self._reclaim_expired(now)
+            row = self.conn.execute('''
+                SELECT w.id, w.url, w.host, w.attempts
+                FROM work_items w
+                LEFT JOIN host_politeness h ON h.host = w.host
+                WHERE w.status = 'pending'
+                  AND w.available_at <= ?
+                  AND (h.next_allowed IS NULL OR h.next_allowed <= ?)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM work_items busy
+                      WHERE busy.host = w.host AND busy.status = 'leased'
+                  )
+                ORDER BY w.available_at, w.id
+                LIMIT 1
+            ''', (now, now)).fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+
+            item_id, url, host, attempts = row
+            self.conn.execute('''
+                UPDATE work_items
+                SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker_id, now + lease_seconds, item_id))
+            self.conn.execute('''
+                INSERT OR REPLACE INTO host_politeness (host, next_allowed, interval)
+                VALUES (?, ?, ?)
+            ''', (host, now + host_interval, host_interval))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return WorkItem(item_id, url, host, attempts + 1)
+
+    def _release(self, item, worker_id, status, available_at, error):
+        """Finish a lease and restart the host's politeness interval from now"""
+        self._transaction()
+        try:
+            cursor = self.conn.execute('''
+                UPDATE work_items
+                SET status = ?, available_at = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?
+            ''', (status, available_at, error, item.id, worker_id))
+            if cursor.rowcount:
+                # The interval counts from when the analysis finished, not when it started
+                self.conn.execute('''
+                    UPDATE host_politeness
+                    SET next_allowed = MAX(next_allowed, ? + interval)
+                    WHERE host = ?
+                ''', (time.time(), item.host))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def complete(self, item, worker_id):
+        self._release(item, worker_id, 'done', time.time(), None)
+
+    def fail(self, item, worker_id, error):
+        if item.attempts >= self.max_attempts:
+            status, available_at = 'failed', time.time()
+        else:
+            status = 'pending'
+            available_at = time.time() + self.retry_backoff * 2 ** (item.attempts - 1)
+        self._release(item, worker_id, status, available_at, str(error))
+
+    def stats(self):
+        rows = self.conn.execute('SELECT status, COUNT(*) FROM work_items GROUP BY status').fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.conn.close()
+
+
+QUEUE_BACKENDS = {
+    'sqlite': SQLiteWorkQueue
+}
+
+
+def open_queue(spec, **options):
+    """Open a queue from a spec such as 'sqlite:work_queue.db' (a bare path means SQLite)"""
+    backend, sep, location = spec.partition(':')
+    if not sep or backend not in QUEUE_BACKENDS:
+        backend, location = 'sqlite', spec
+    return QUEUE_BACKENDS[backend](location, **options)
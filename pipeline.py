@@ -0,0 +1,274 @@
+"""Agent pipeline shared by the web app, the batch workers and the scheduler.
+
+Kept free of Flask so short-lived workers can run analyses without paying
+for the web framework at import time.
+"""
+from models.database import Database
+from models.preferences import PreferenceManager
+from agents.document_access import DocumentAccessAgent
+from agents.content_analysis import ContentAnalysisAgent
+from agents.technical_validation import TechnicalValidationAgent
+from agents.decision_making import DecisionMakingAgent
+from urllib.parse import urlparse
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+# Database and agents are built on first use rather than at import time, so
+# short-lived workers only pay for what they actually touch
+_components = None
+_executor = None
+_init_lock = threading.Lock()
+
+# Per-stage time budgets (seconds) for run_analysis; stages that overrun are
+# cut off and the result is marked as degraded instead of waiting
+STAGE_BUDGETS = {
+    'fetch': float(os.environ.get('ANALYZE_FETCH_BUDGET', 12)),
+    'analyze': float(os.environ.get('ANALYZE_ANALYZE_BUDGET', 3)),
+    'decide': float(os.environ.get('ANALYZE_DECIDE_BUDGET', 1))
+}
+STAGE_WORKERS = int(os.environ.get('ANALYZE_STAGE_WORKERS', 32))
+
+# Fetches stop reading a document after this many bytes, which also keeps an
+# analyze task abandoned at its deadline from running for long
+MAX_DOCUMENT_BYTES = int(os.environ.get('ANALYZE_MAX_DOCUMENT_BYTES', 2_000_000))
+
+def get_components():
+    """Return the shared database, preference manager and agents, creating them on first call"""
+    global _components
+    if _components is not None:
+        return _components
+    with _init_lock:
+        if _components is None:
+            try:
+                # Initialize database and preference manager
+                print("Initializing database and preference manager...")
+                db = Database(os.environ.get('SCRAPING_ANALYZER_DB', 'scraping_analyzer.db'))
+                pref_manager = PreferenceManager(db)
+
+                # Initialize agents
+                print("Initializing agents...")
+                _components = SimpleNamespace(
+                    db=db,
+                    pref_manager=pref_manager,
+                    doc_agent=DocumentAccessAgent(pref_manager, max_document_bytes=MAX_DOCUMENT_BYTES),
+                    content_agent=ContentAnalysisAgent(pref_manager),
+                    tech_agent=TechnicalValidationAgent(pref_manager),
+                    decision_agent=DecisionMakingAgent(pref_manager)
+                )
+                print("Initialization complete!")
+            except Exception as e:
+                print(f"Error during initialization: {str(e)}")
+                print(traceback.format_exc())
+                raise
+    return _components
+
+def is_valid_url(url):
+    try:
+        result = urlparse(url)
+        return all([result.netloc])
+    except:
+        return False
+
+def get_executor():
+    """Shared thread pool for pipeline stages, created on first use"""
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix='analyze')
+    return _executor
+
+def run_stage(stage, tasks):
+    """Run named callables concurrently within the stage's time budget.
+
+    Returns (results, missing_inputs). Tasks that raise or are still running
+    when the budget runs out are reported as missing and are not waited for.
+    Python threads cannot be interrupted: cancel() only drops tasks that have
+    not started, and a running task keeps its pool thread until it finishes.
+    That work is bounded instead: fetches stream the body and give up once
+    their deadline passes (overshooting by at most one socket read timeout)
+    or MAX_DOCUMENT_BYTES have been read, which also caps what an analyze
+    task has to scan.
+    """
+    budget = STAGE_BUDGETS[stage]
+    futures = {name: get_executor().submit(task) for name, task in tasks.items()}
+    done, _ = wait(futures.values(), timeout=budget)
+
+    results, missing = {}, []
+    for name, future in futures.items():
+        if future not in done:
+            # cancel() only succeeds for tasks still queued behind a busy pool
+            if future.cancel():
+                reason = f'not started within {budget:g}s budget (worker pool busy)'
+            else:
+                reason = f'exceeded {budget:g}s budget'
+            missing.append({'input': name, 'stage': stage, 'reason': reason})
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            missing.append({'input': name, 'stage': stage, 'reason': str(e)})
+    return results, missing
+
+def get_primary_domain(url):
+    """Extract and format the primary domain from URL"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+class IncompleteAnalysisError(Exception):
+    """Raised by run_analysis(require_complete=True) when inputs were missing, before anything is saved"""
+
+    def __init__(self, missing_inputs):
+        self.missing_inputs = missing_inputs
+        names = ', '.join(f"{m['input']} ({m['reason']})" for m in missing_inputs)
+        super().__init__(f"Analysis incomplete, missing: {names}")
+
+def run_analysis(url, require_complete=False, raise_save_errors=False):
+    """Run the full agent pipeline for a normalized URL and save the result.
+
+    Interactive callers get a degraded result, and only a warning if saving
+    fails. Batch workers, which can retry, pass require_complete=True to get
+    IncompleteAnalysisError instead of a degraded result, and
+    raise_save_errors=True so a failed write is never reported as done.
+    """
+    components = get_components()
+    doc_agent = components.doc_agent
+    content_agent = components.content_agent
+    tech_agent = components.tech_agent
+    decision_agent = components.decision_agent
+
+    primary_domain = get_primary_domain(url)
+    print(f"Primary domain: {primary_domain}")
+
+    missing_inputs = []
+    stage_timings = {}
+
+    # Fetch documents concurrently; anything still running at the deadline is dropped
+    print("Fetching robots.txt, ToS and main page...")
+    started = time.monotonic()
+    fetch_deadline = started + STAGE_BUDGETS['fetch']
+    fetched, missing = run_stage('fetch', {
+        'robots_txt': lambda: doc_agent.fetch_document(url, 'robots.txt', deadline=fetch_deadline),
+        'terms_of_service': lambda: doc_agent.fetch_document(url, 'tos', deadline=fetch_deadline),
+        'main_page': lambda: doc_agent.fetch_document(url, 'main', deadline=fetch_deadline)
+    })
+    stage_timings['fetch'] = (time.monotonic() - started) * 1000
+    missing_inputs.extend(missing)
+
+    # Documents that could not be retrieved are missing, not evidence of "no restrictions"
+    for name, content in list(fetched.items()):
+        if content.get('unavailable') or (name == 'main_page' and not content.get('success')):
+            reason = content.get('error') or f"HTTP {content.get('status_code')}"
+            missing_inputs.append({'input': name, 'stage': 'fetch', 'reason': reason})
+            del fetched[name]
+
+    # Analyze content
+    print("Analyzing fetched documents...")
+    analysis_tasks = {}
+    if 'robots_txt' in fetched:
+        analysis_tasks['robots_txt'] = lambda: content_agent.analyze_robots_txt(fetched['robots_txt'])
+    if 'terms_of_service' in fetched:
+        analysis_tasks['terms_of_service'] = lambda: content_agent.analyze_tos(fetched['terms_of_service'])
+    if 'main_page' in fetched:
+        analysis_tasks['main_page'] = lambda: tech_agent.check_technical_restrictions(fetched['main_page'])
+    started = time.monotonic()
+    analyses, missing = run_stage('analyze', analysis_tasks)
+    stage_timings['analyze'] = (time.monotonic() - started) * 1000
+    missing_inputs.extend(missing)
+
+    robots_analysis = analyses.get('robots_txt')
+    tos_analysis = analyses.get('terms_of_service')
+    tech_analysis = analyses.get('main_page')
+
+    # Prepare rules for decision making
+    rules_examined = []
+
+    # Add robots.txt analysis with proper name
+    if robots_analysis:
+        robots_analysis['name'] = 'Robots.txt Analysis'
+        print(f"Robots.txt analysis: {robots_analysis}")
+        rules_examined.append(robots_analysis)
+
+    # Add ToS analysis with proper name
+    if tos_analysis:
+        tos_analysis['name'] = 'Terms of Service Analysis'
+        print(f"ToS analysis: {tos_analysis}")
+        rules_examined.append(tos_analysis)
+
+    # Add technical analysis with proper name
+    if tech_analysis:
+        tech_analysis['name'] = 'Technical Analysis'
+        print(f"Technical analysis: {tech_analysis}")
+        rules_examined.append(tech_analysis)
+
+    print(f"Total rules examined: {len(rules_examined)}")
+    for rule in rules_examined:
+        print(f"Rule: {rule.get('name')}, Status: {rule.get('status')}")
+
+    # Make final decision using Decision Making Agent
+    print("Making final decision...")
+    started = time.monotonic()
+    decided, missing = run_stage('decide', {
+        'decision': lambda: decision_agent.make_decision(rules_examined, url)
+    })
+    stage_timings['decide'] = (time.monotonic() - started) * 1000
+    missing_inputs.extend(missing)
+    license_decision = decided.get('decision') or decision_agent.fallback_decision(rules_examined, url)
+
+    if require_complete and missing_inputs:
+        raise IncompleteAnalysisError(missing_inputs)
+
+    license_decision = decision_agent.apply_degradation(license_decision, missing_inputs)
+    license_decision['details']['stage_timings_ms'] = stage_timings
+    print(f"Decision made: {license_decision.get('usageLicenseType')}"
+          f"{' (degraded)' if missing_inputs else ''}")
+
+    # Get decision explanation
+    decision_explanation = decision_agent.explain_decision(license_decision)
+    print("Decision explanation:", decision_explanation)
+
+    # Format final result
+    analysis_result = {
+        "Issuer": {
+            "directoryUrls": [
+                {
+                    "directoryUrl": url
+                }
+            ],
+            "primaryDomain": primary_domain,
+            "LicenseType": {
+                **license_decision,
+                "usageRulesExamined": [
+                    {
+                        "usageRuleExamined": {
+                            "@id": rule.get('@id', url),
+                            "@type": "UsageRuleExamined",
+                            "checked": True,
+                            "confidenceScore": rule.get('confidenceScore', 85.0),
+                            "details": rule.get('details', ''),
+                            "elementId": rule.get('elementId', str(uuid.uuid4())),
+                            "name": rule.get('name', 'Unknown Analysis'),
+                            "statusText": rule.get('status', 'unknown'),
+                            "url": rule.get('url', url)
+                        }
+                    } for rule in rules_examined
+                ]
+            }
+        }
+    }
+
+    # Save analysis to database
+    try:
+        components.db.save_analysis(url, analysis_result)
+        print("Analysis saved to database")
+    except Exception as e:
+        if raise_save_errors:
+            raise
+        print(f"Warning: Could not save to database: {e}")
+
+    return analysis_result
@@ -0,0 +1,208 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import pipeline
+from agents import rule_packs
+from agents.content_analysis import ContentAnalysisAgent
+from agents.decision_making import DecisionMakingAgent
+from models.database import Database
+from models.preferences import PreferenceManager
+
+URL = 'https://example.test/'
+RIGHTS = ('rightsToDerivate', 'rightsToRedistribute', 'rightsToScrape', 'rightsToTag', 'rightsToTransform')
+
+
+class StubDocuments:
+    """Document agent returning canned fetch results by document type"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def fetch_document(self, url, doc_type, deadline=None):
+        return self.documents[doc_type]
+
+
+class SlowTechnicalAgent:
+    """Technical agent that outlives any small analyze budget"""
+
+    def __init__(self, release):
+        self.release = release
+
+    def check_technical_restrictions(self, main_content):
+        self.release.wait(5)
+        return {'status': 'allowed', 'confidence': 85.0, 'details': 'No technical restrictions found'}
+
+
+def _document(content, url=URL):
+    return {'success': True, 'content': content, 'url': url, 'status_code': 200, 'headers': {}}
+
+
+def _unavailable(url=URL):
+    return {'success': False, 'error': 'Connection refused', 'url': url, 'headers': {}, 'unavailable': True}
+
+
+@pytest.fixture
+def pref_manager(tmp_path, monkeypatch):
+    # Keep the rule pack cache out of the user's cache directory
+    registry = rule_packs.RuleRegistry(rule_packs.DEFAULT_RULES_DIR, cache_path=str(tmp_path / 'rules.marshal'))
+    monkeypatch.setattr(rule_packs, '_registry', registry)
+    return PreferenceManager(Database(str(tmp_path / 'analyzer.db')))
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _install_components(monkeypatch, pref_manager, doc_agent, tech_agent):
+    components = SimpleNamespace(
+        db=pref_manager.db,
+        pref_manager=pref_manager,
+        doc_agent=doc_agent,
+        content_agent=ContentAnalysisAgent(pref_manager),
+        tech_agent=tech_agent,
+        decision_agent=DecisionMakingAgent(pref_manager)
+    )
+    monkeypatch.setattr(pipeline, '_components', components)
+    return components
+
+
+def test_no_evidence_grants_no_rights(pref_manager):
+    decision = DecisionMakingAgent(pref_manager).make_decision([], URL)
+
+    assert decision['usageLicenseType'] == 'RESTRICTED'
+    assert not any(decision[right] for right in RIGHTS)
+    assert decision['details']['decision_confidence'] == 0.0
+
+
+def test_fallback_decision(pref_manager):
+    agent = DecisionMakingAgent(pref_manager)
+    allowed = {'status': 'allowed', 'confidence': 80.0, 'details': 'No explicit restrictions found'}
+    restricted = {'status': 'restricted', 'confidence': 90.0, 'details': ['no scraping']}
+
+    decision = agent.fallback_decision([allowed, restricted], URL)
+    assert decision['usageLicenseType'] == 'RESTRICTED'
+    assert decision['details']['decision_confidence'] == 45.0
+    assert len(decision['details']['restrictions_found']) == 1
+
+    decision = agent.fallback_decision([allowed], URL)
+    assert decision['usageLicenseType'] == 'OPEN'
+    assert decision['details']['decision_confidence'] == 40.0
+
+    decision = agent.fallback_decision([], URL)
+    assert decision['usageLicenseType'] == 'RESTRICTED'
+    assert not any(decision[right] for right in RIGHTS)
+
+
+@pytest.mark.parametrize('missing_count, confidence', [(0, 80.0), (1, 64.0), (2, 48.0), (6, 16.0)])
+def test_apply_degradation(pref_manager, missing_count, confidence):
+    agent = DecisionMakingAgent(pref_manager)
+    missing = [{'input': f'input{i}', 'stage': 'fetch', 'reason': 'timeout'} for i in range(missing_count)]
+    decision = agent._build_decision(URL, False, 80.0, 0.0, [], 'test')
+
+    decision = agent.apply_degradation(decision, missing)
+
+    assert decision['details']['degraded'] == bool(missing)
+    assert decision['details']['missing_inputs'] == missing
+    assert decision['details']['decision_confidence'] == pytest.approx(confidence)
+
+
+def test_run_stage_reports_overruns_and_errors(monkeypatch, release):
+    monkeypatch.setitem(pipeline.STAGE_BUDGETS, 'analyze', 0.1)
+
+    def broken():
+        raise ValueError('parse error')
+
+    started = time.monotonic()
+    results, missing = pipeline.run_stage('analyze', {
+        'fast': lambda: 1,
+        'slow': lambda: release.wait(5),
+        'broken': broken
+    })
+
+    assert time.monotonic() - started < 1
+    assert results == {'fast': 1}
+    assert missing == [
+        {'input': 'slow', 'stage': 'analyze', 'reason': 'exceeded 0.1s budget'},
+        {'input': 'broken', 'stage': 'analyze', 'reason': 'parse error'}
+    ]
+
+
+def test_run_stage_reports_tasks_stuck_behind_busy_pool(monkeypatch, release):
+    monkeypatch.setitem(pipeline.STAGE_BUDGETS, 'analyze', 0.1)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(pipeline, '_executor', executor)
+
+    ran = []
+    _, missing = pipeline.run_stage('analyze', {
+        'slow': lambda: release.wait(5),
+        'queued': lambda: ran.append('queued')
+    })
+    release.set()
+    executor.shutdown(wait=True)
+
+    assert [m['reason'] for m in missing] == [
+        'exceeded 0.1s budget',
+        'not started within 0.1s budget (worker pool busy)'
+    ]
+    # Cancelled, so it never runs once the pool frees up
+    assert ran == []
+
+
+def test_run_analysis_degrades_when_a_stage_overruns(monkeypatch, pref_manager, release):
+    monkeypatch.setitem(pipeline.STAGE_BUDGETS, 'analyze', 0.2)
+    components = _install_components(monkeypatch, pref_manager, StubDocuments({
+        'robots.txt': _document('User-agent: *\nAllow: /'),
+        'tos': _document('Welcome to our terms.'),
+        'main': _document('<html><body>Hello</body></html>')
+    }), SlowTechnicalAgent(release))
+
+    result = pipeline.run_analysis(URL)
+
+    details = result['Issuer']['LicenseType']['details']
+    assert details['degraded'] is True
+    assert details['missing_inputs'] == [
+        {'input': 'main_page', 'stage': 'analyze', 'reason': 'exceeded 0.2s budget'}
+    ]
+    assert [r['usageRuleExamined']['name'] for r in result['Issuer']['LicenseType']['usageRulesExamined']] == [
+        'Robots.txt Analysis', 'Terms of Service Analysis'
+    ]
+    assert len(components.db.get_recent_analyses()) == 1
+
+
+def test_run_analysis_without_any_input_grants_no_rights(monkeypatch, pref_manager, release):
+    _install_components(monkeypatch, pref_manager, StubDocuments({
+        'robots.txt': _unavailable(),
+        'tos': _unavailable(),
+        'main': _unavailable()
+    }), SlowTechnicalAgent(release))
+
+    license_type = pipeline.run_analysis(URL)['Issuer']['LicenseType']
+
+    assert license_type['usageLicenseType'] == 'RESTRICTED'
+    assert not any(license_type[right] for right in RIGHTS)
+    assert license_type['details']['decision_confidence'] == 0.0
+    assert [m['input'] for m in license_type['details']['missing_inputs']] == [
+        'robots_txt', 'terms_of_service', 'main_page'
+    ]
+
+
+def test_incomplete_analysis_is_not_saved_when_completeness_required(monkeypatch, pref_manager, release):
+    monkeypatch.setitem(pipeline.STAGE_BUDGETS, 'analyze', 0.2)
+    components = _install_components(monkeypatch, pref_manager, StubDocuments({
+        'robots.txt': _document('User-agent: *\nAllow: /'),
+        'tos': _unavailable(),
+        'main': _document('<html></html>')
+    }), SlowTechnicalAgent(release))
+
+    with pytest.raises(pipeline.IncompleteAnalysisError) as excinfo:
+        pipeline.run_analysis(URL, require_complete=True)
+
+    assert [m['input'] for m in excinfo.value.missing_inputs] == ['terms_of_service', 'main_page']
+    assert components.db.get_recent_analyses() == []
@@ -0,0 +1,163 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from agents.revalidation import InteractiveTraffic, RevalidationAgent
+from models.database import Database
+from models.preferences import PreferenceManager
+
+
+class StubResponse:
+    def __init__(self, status_code, headers=None, text=''):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+
+    def close(self):
+        pass
+
+
+class StubSession:
+    """Session answering HEAD with fixed validators and robots.txt with a fixed body"""
+
+    def __init__(self, head_status=200, head_headers=None, robots='User-agent: *'):
+        self.head_status = head_status
+        self.head_headers = head_headers or {}
+        self.robots = robots
+        self.requests = []
+
+    def head(self, url, headers=None, **kwargs):
+        self.requests.append(('HEAD', url, headers))
+        return StubResponse(self.head_status, self.head_headers)
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(('GET', url, headers))
+        return StubResponse(200, text=self.robots)
+
+
+def _result(license_type='OPEN', confidence=95.0):
+    return {'Issuer': {'LicenseType': {
+        'usageLicenseType': license_type,
+        'details': {'decision_confidence': confidence}
+    }}}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / 'analyzer.db'))
+
+
+def _agent(db, analyze_fn=None, **options):
+    options.setdefault('requests_per_minute', 1000)
+    agent = RevalidationAgent(PreferenceManager(db), db, analyze_fn or (lambda url: None), **options)
+    agent.session = StubSession()
+    return agent
+
+
+def test_restricted_and_low_confidence_domains_are_due_sooner(db):
+    db.save_analysis('https://open.test/', _result())
+    db.save_analysis('https://restricted.test/', _result('RESTRICTED'))
+    db.save_analysis('https://unsure.test/', _result(confidence=50.0))
+    db.save_analysis('https://both.test/', _result('RESTRICTED', confidence=0.4))
+    agent = _agent(db, interval_hours=24)
+    now = datetime.utcnow()
+
+    assert [url for _, url, _ in agent.get_due_domains(now + timedelta(hours=7))] == ['https://both.test/']
+    assert {url for _, url, _ in agent.get_due_domains(now + timedelta(hours=13))} == {
+        'https://both.test/', 'https://restricted.test/', 'https://unsure.test/'
+    }
+    due = agent.get_due_domains(now + timedelta(hours=25))
+    assert len(due) == 4
+    assert due[0][1] == 'https://both.test/'
+    assert due[-1][1] == 'https://open.test/'
+
+
+@pytest.mark.parametrize('failures, backoff_hours', [(1, 2), (3, 8), (20, 2 ** RevalidationAgent.MAX_FAILURE_BACKOFF)])
+def test_failures_back_off_the_cadence(db, failures, backoff_hours):
+    db.save_analysis('https://down.test/', _result())
+    for _ in range(failures):
+        db.record_revalidation_failure('https://down.test/')
+    agent = _agent(db, interval_hours=1)
+    now = datetime.utcnow()
+
+    assert agent.get_due_domains(now + timedelta(hours=backoff_hours - 0.1)) == []
+    assert len(agent.get_due_domains(now + timedelta(hours=backoff_hours + 0.1))) == 1
+
+
+def test_not_modified_keeps_stored_validators(db):
+    url = 'https://example.test/'
+    agent = _agent(db)
+    agent.session = StubSession(head_headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'})
+    assert agent.revalidate(url, datetime.utcnow()) == 'unchanged'
+    baseline = db.get_revalidation_state(url)
+
+    agent.session = StubSession(head_status=304)
+    assert agent.revalidate(url, datetime.utcnow()) == 'unchanged'
+
+    state = db.get_revalidation_state(url)
+    assert agent.session.requests[0][2] == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Mon, 05 Oct 2026 10:00:00 GMT'
+    }
+    assert (state['etag'], state['last_modified'], state['content_hash']) == (
+        baseline['etag'], baseline['last_modified'], baseline['content_hash']
+    )
+
+
+def test_change_is_kept_until_reanalysis_succeeds(db):
+    url = 'https://example.test/'
+    attempts = []
+
+    def analyze(target):
+        attempts.append(target)
+        if len(attempts) == 1:
+            raise RuntimeError('database is locked')
+
+    agent = _agent(db, analyze)
+    agent.session = StubSession(head_headers={'ETag': '"v1"'})
+    assert agent.revalidate(url, datetime.utcnow()) == 'unchanged'
+
+    agent.session = StubSession(head_headers={'ETag': '"v2"'})
+    assert agent.revalidate(url, datetime.utcnow()) == 'failed'
+    assert db.get_revalidation_state(url)['failures'] == 1
+    assert agent.revalidate(url, datetime.utcnow()) == 'reanalyzed'
+    assert db.get_revalidation_state(url)['failures'] == 0
+    assert agent.revalidate(url, datetime.utcnow()) == 'unchanged'
+    assert len(attempts) == 2
+
+
+def test_scheduler_waits_while_interactive_request_is_open(db):
+    traffic = InteractiveTraffic(quiet_seconds=0.1)
+    agent = _agent(db, interactive=traffic)
+    entered, leave = threading.Event(), threading.Event()
+
+    def interactive_request():
+        with traffic.track():
+            entered.set()
+            leave.wait(5)
+
+    request = threading.Thread(target=interactive_request)
+    request.start()
+    entered.wait(5)
+    threading.Timer(0.3, leave.set).start()
+
+    started = time.monotonic()
+    assert agent._acquire() is True
+    waited = time.monotonic() - started
+    request.join(5)
+
+    # Released only once the request finished and the quiet period passed
+    assert waited >= 0.4
+
+
+def test_stop_interrupts_wait_for_interactive_traffic():
+    traffic = InteractiveTraffic(quiet_seconds=60)
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+
+    with traffic.track():
+        started = time.monotonic()
+        assert traffic.wait_until_idle(stop) is False
+    assert time.monotonic() - started < 2
@@ -0,0 +1,122 @@
+import json
+import os
+import random
+import re
+
+import pytest
+
+from agents import rule_packs
+from agents.rule_packs import CompiledRules, Rule, RuleRegistry, build_tables, required_literal
+
+
+def _rule(pattern, kind='phrase', category='scraping'):
+    return Rule(category, pattern, kind, 'any', 1.0, None)
+
+
+def _naive_find(rules, text, category):
+    """The straightforward scan the compiled tables must agree with"""
+    return [
+        rule for rule in rules
+        if rule.category == category
+        and (rule.pattern in text if rule.kind == 'phrase' else re.search(rule.pattern, text))
+    ]
+
+
+def _write_pack(directory, name, rules):
+    path = directory / name
+    path.write_text(json.dumps({'name': name, 'rules': rules}), encoding='utf-8')
+    return path
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.mark.parametrize('scan_limit', [1000, 0], ids=['substring', 'regex'])
+def test_find_matches_naive_scan(monkeypatch, scan_limit):
+    monkeypatch.setattr(rule_packs, 'SUBSTRING_SCAN_LIMIT', scan_limit)
+    rng = random.Random(7)
+    # A tiny alphabet makes phrases overlap, nest and share prefixes constantly
+    alphabet = 'ab c'
+    phrases = {''.join(rng.choices(alphabet, k=rng.randint(1, 6))).strip() for _ in range(300)}
+    rules = [_rule(phrase) for phrase in sorted(phrases) if phrase]
+    rules += [
+        _rule('ab(c )?ba', kind='regex'),
+        _rule('b+ ?a', kind='regex'),
+        _rule('ca', category='copyright')
+    ]
+    rng.shuffle(rules)
+    compiled = CompiledRules(rules, build_tables(rules))
+
+    for _ in range(1000):
+        text = ''.join(rng.choices(alphabet, k=rng.randint(0, 60)))
+        assert compiled.find(text, 'scraping') == _naive_find(rules, text, 'scraping'), text
+        assert compiled.find(text, 'copyright') == _naive_find(rules, text, 'copyright'), text
+    assert compiled.find('anything', 'captcha') == []
+
+
+def test_find_reports_overlapping_and_nested_phrases(monkeypatch):
+    monkeypatch.setattr(rule_packs, 'SUBSTRING_SCAN_LIMIT', 0)
+    rules = [_rule(p) for p in ('captcha', 'recaptcha', 'g-recaptcha', 'cha-cha', 'rec')]
+    compiled = CompiledRules(rules, build_tables(rules))
+
+    found = [rule.pattern for rule in compiled.find('<div class="g-recaptcha-cha">', 'scraping')]
+    assert found == ['captcha', 'recaptcha', 'g-recaptcha', 'cha-cha', 'rec']
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('scraping is (strictly )?prohibited', 'scraping is'),
+    ('(automated )?data (mining )?collection', 'collection'),
+    ('NO Robots', 'no robots'),
+    ('ab(c)?', None),
+    (r'terms \(of use\)', None),
+    (r'scraping \(strictly\)? prohibited', None),
+    ('scraping|crawling is prohibited', None),
+    ('no (scraping|crawling)', None),
+    ('scraping (is )+prohibited', None),
+    ('bots? are not allowed', None)
+])
+def test_required_literal(pattern, expected):
+    assert required_literal(pattern) == expected
+
+
+def test_cache_is_used_until_a_pack_changes(tmp_path, monkeypatch):
+    packs = tmp_path / 'rules'
+    packs.mkdir()
+    path = _write_pack(packs, 'default.json', [{'category': 'scraping', 'pattern': 'no scraping'}])
+    cache_path = str(tmp_path / 'cache' / 'rules.marshal')
+    RuleRegistry(str(packs), cache_path=cache_path).reload()
+    assert os.path.exists(cache_path)
+
+    loaded = []
+    real_load = rule_packs.load_pack_file
+    monkeypatch.setattr(rule_packs, 'load_pack_file', lambda p: loaded.append(p) or real_load(p))
+
+    compiled = RuleRegistry(str(packs), cache_path=cache_path).reload()
+    assert loaded == []
+    assert [rule.pattern for rule in compiled.find('no scraping here', 'scraping')] == ['no scraping']
+
+    _bump_mtime(path)
+    RuleRegistry(str(packs), cache_path=cache_path).reload()
+    assert loaded == [str(path)]
+
+
+def test_hot_reload_keeps_last_good_rules(tmp_path):
+    packs = tmp_path / 'rules'
+    packs.mkdir()
+    path = _write_pack(packs, 'default.json', [{'category': 'scraping', 'pattern': 'no scraping'}])
+    registry = RuleRegistry(str(packs), cache_path=str(tmp_path / 'rules.marshal'), check_interval=0)
+    original = registry.get()
+
+    path.write_text('{"rules": [', encoding='utf-8')
+    _bump_mtime(path)
+    assert registry.get() is original
+    assert registry.get().find('no scraping', 'scraping')
+
+    _write_pack(packs, 'default.json', [{'category': 'scraping', 'pattern': 'no bots'}])
+    _bump_mtime(path)
+    reloaded = registry.get()
+    assert reloaded is not original
+    assert reloaded.find('no scraping', 'scraping') == []
+    assert reloaded.find('no bots', 'scraping')
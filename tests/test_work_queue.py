@@ -0,0 +1,126 @@
+import multiprocessing
+import time
+
+from models.work_queue import SQLiteWorkQueue, open_queue
+
+
+def _drain(path, worker_id, results):
+    """Worker process body: lease and complete items until none are left"""
+    queue = SQLiteWorkQueue(path)
+    leased = []
+    while True:
+        item = queue.lease(worker_id, lease_seconds=60, host_interval=0)
+        if item is None:
+            if not queue.has_unfinished():
+                break
+            time.sleep(0.01)
+            continue
+        leased.append(item.id)
+        queue.complete(item, worker_id)
+    queue.close()
+    results.put((worker_id, leased))
+
+
+def _hold_lease(path, host_interval, results):
+    """Lease one item and keep it, reporting what was leased"""
+    queue = SQLiteWorkQueue(path)
+    item = queue.lease('holder', lease_seconds=60, host_interval=host_interval)
+    results.put(item.host if item else None)
+    queue.close()
+
+
+def test_processes_never_lease_the_same_item(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    queue = SQLiteWorkQueue(path)
+    urls = [f'https://host{i % 20}.test/page{i}' for i in range(200)]
+    assert queue.enqueue(urls) == 200
+
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_drain, args=(path, f'worker-{n}', results))
+        for n in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    leased = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=60)
+
+    all_ids = [item_id for _, ids in leased for item_id in ids]
+    assert len(all_ids) == 200
+    assert len(set(all_ids)) == 200
+    assert queue.stats() == {'done': 200}
+
+
+def test_host_with_active_lease_is_not_leased_again(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    queue = SQLiteWorkQueue(path)
+    queue.enqueue(['https://a.example/1', 'https://a.example/2', 'https://b.example/1'])
+
+    # Zero interval: only the in-flight lease on a.example can hold it back
+    results = multiprocessing.Queue()
+    for _ in range(3):
+        process = multiprocessing.Process(target=_hold_lease, args=(path, 0, results))
+        process.start()
+        process.join(timeout=30)
+    hosts = [results.get(timeout=5) for _ in range(3)]
+
+    assert sorted(h for h in hosts if h) == ['a.example', 'b.example']
+    assert hosts.count(None) == 1
+
+
+def test_host_interval_counts_from_completion(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'))
+    queue.enqueue(['https://a.example/1', 'https://a.example/2'])
+
+    item = queue.lease('w1', host_interval=0.5)
+    time.sleep(0.6)
+    queue.complete(item, 'w1')
+    assert queue.lease('w2', host_interval=0.5) is None
+    time.sleep(0.6)
+    assert queue.lease('w2', host_interval=0.5).url == 'https://a.example/2'
+
+
+def test_expired_lease_is_reclaimed_then_fails_after_max_attempts(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    queue.enqueue(['https://a.example/'])
+
+    first = queue.lease('w1', lease_seconds=0.1, host_interval=0)
+    time.sleep(0.2)
+    second = queue.lease('w2', lease_seconds=0.1, host_interval=0)
+    assert second.id == first.id
+    assert second.attempts == 2
+
+    # The stale worker can no longer complete an item it lost
+    queue.complete(first, 'w1')
+    assert queue.stats() == {'leased': 1}
+
+    time.sleep(0.2)
+    assert queue.lease('w3', host_interval=0) is None
+    assert queue.stats() == {'failed': 1}
+
+
+def test_failed_item_is_retried_with_backoff(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'), max_attempts=3, retry_backoff=0.3)
+    queue.enqueue(['https://a.example/'])
+
+    item = queue.lease('w1', host_interval=0)
+    queue.fail(item, 'w1', 'database is locked')
+    assert queue.lease('w1', host_interval=0) is None
+
+    time.sleep(0.35)
+    retry = queue.lease('w1', host_interval=0)
+    assert retry.id == item.id
+    assert retry.attempts == 2
+    queue.fail(retry, 'w1', 'still broken')
+
+    time.sleep(0.65)
+    last = queue.lease('w1', host_interval=0)
+    queue.fail(last, 'w1', 'gave up')
+    assert queue.stats() == {'failed': 1}
+
+
+def test_enqueue_skips_urls_already_queued(tmp_path):
+    queue = open_queue(f"sqlite:{tmp_path / 'queue.db'}")
+    assert queue.enqueue(['https://a.example/', 'https://a.example/']) == 1
+    assert queue.enqueue(['https://a.example/']) == 0
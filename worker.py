@@ -0,0 +1,131 @@
+"""Distributed batch worker.
+
+Any number of these processes, on one machine or many, pull URLs from a
+shared work queue, run the agent pipeline and save results to the central
+analysis_history database.
+
+    python worker.py enqueue urls.txt --queue work_queue.db
+    python worker.py run --queue work_queue.db --db scraping_analyzer.db --processes 4
+    python worker.py stats --queue work_queue.db
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+
+from models.work_queue import open_queue
+
+
+def normalize_url(url):
+    url = url.strip()
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+def run_worker(args):
+    """Lease and analyze URLs until the queue drains (or forever, unless --exit-when-empty)"""
+    if args.db:
+        os.environ['SCRAPING_ANALYZER_DB'] = args.db
+    # Imported here so each worker process builds its own database connection and agents;
+    # pipeline (unlike main) does not import Flask
+    import pipeline
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    queue = open_queue(args.queue, max_attempts=args.max_attempts, retry_backoff=args.retry_backoff,
+                       wal=args.wal)
+    print(f"Worker {worker_id} started")
+    processed = 0
+
+    try:
+        while True:
+            item = queue.lease(worker_id, lease_seconds=args.lease_seconds, host_interval=args.host_interval)
+            if item is None:
+                if args.exit_when_empty and not queue.has_unfinished():
+                    break
+                time.sleep(args.poll_interval)
+                continue
+
+            try:
+                if not pipeline.is_valid_url(item.url):
+                    raise ValueError(f'Invalid URL format: {item.url}')
+                # Retry incomplete analyses; on the last attempt, record the degraded result
+                pipeline.run_analysis(
+                    item.url,
+                    require_complete=item.attempts < args.max_attempts,
+                    raise_save_errors=True
+                )
+                queue.complete(item, worker_id)
+                processed += 1
+            except Exception as e:
+                print(f"Worker {worker_id} failed on {item.url}: {e}")
+                print(traceback.format_exc())
+                queue.fail(item, worker_id, e)
+    finally:
+        queue.close()
+
+    print(f"Worker {worker_id} finished after {processed} analyses")
+    return processed
+
+
+def enqueue(args):
+    with open(args.file, encoding='utf-8') as f:
+        urls = [normalize_url(line) for line in f if line.strip() and not line.startswith('#')]
+    queue = open_queue(args.queue, wal=args.wal)
+    added = queue.enqueue(urls)
+    queue.close()
+    print(f"Enqueued {added} of {len(urls)} URLs")
+
+
+def stats(args):
+    queue = open_queue(args.queue, wal=args.wal)
+    print(queue.stats())
+    queue.close()
+
+
+def run(args):
+    if args.processes <= 1:
+        run_worker(args)
+        return
+    processes = [multiprocessing.Process(target=run_worker, args=(args,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Distributed scraping analyzer worker')
+    parser.add_argument('--queue', default=os.environ.get('WORK_QUEUE', 'work_queue.db'),
+                        help="queue spec, e.g. 'sqlite:/shared/work_queue.db'")
+    parser.add_argument('--wal', action='store_true',
+                        help='use SQLite WAL mode; only safe when every worker runs on this machine')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = commands.add_parser('enqueue', help='add URLs from a file, one per line')
+    enqueue_parser.add_argument('file')
+    enqueue_parser.set_defaults(func=enqueue)
+
+    commands.add_parser('stats', help='show queue counts by status').set_defaults(func=stats)
+
+    run_parser = commands.add_parser('run', help='process queued URLs')
+    run_parser.add_argument('--db', help='central analysis database (defaults to SCRAPING_ANALYZER_DB)')
+    run_parser.add_argument('--processes', type=int, default=1)
+    run_parser.add_argument('--host-interval', type=float, default=10.0,
+                            help='minimum seconds between one analysis of a host finishing and the next '
+                                 'starting, across all nodes')
+    run_parser.add_argument('--lease-seconds', type=float, default=300.0)
+    run_parser.add_argument('--max-attempts', type=int, default=3)
+    run_parser.add_argument('--retry-backoff', type=float, default=30.0)
+    run_parser.add_argument('--poll-interval', type=float, default=2.0)
+    run_parser.add_argument('--exit-when-empty', action='store_true')
+    run_parser.set_defaults(func=run)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    args.func(args)